@@ -6,25 +6,76 @@ from flask import (
     session,
     redirect,
     url_for,
-    send_file,
+    Response,
+    stream_with_context,
 )
+from flask.json.provider import JSONProvider
 from dotenv import load_dotenv
-import json
+import gzip
+import orjson
 import os
 import tempfile
 load_dotenv()
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 import uuid
-from datetime import datetime
+import queue
+import threading
+import time
+import atexit
+import logging
+import logging.handlers
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from itertools import chain
+from datetime import datetime, timezone
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from io import BytesIO, StringIO
 import sqlite3
 import csv
+import mimetypes
+import unicodedata
+from urllib.parse import quote
 
 
+class OrjsonProvider(JSONProvider):
+    """Serve jsonify() and request.json with orjson instead of the stdlib"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS), mimetype="application/json"
+        )
+
+# Logging
+#
+# Request threads only put records on a queue; a listener thread does the
+# formatting and the blocking write to stderr. Set LOG_LEVEL=WARNING in
+# production to skip the per-request debug/info records entirely.
+log = logging.getLogger("app")
+log.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+log.propagate = False
+_log_queue = queue.SimpleQueue()
+log.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(
+    logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s")
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = "your-secret-key-here-change-this-in-production"
 
 # Configuration - Enhanced file types
@@ -36,48 +87,181 @@ ALLOWED_EXTENSIONS = {
 }
 
 app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024
+# Unhandled errors become a logged 500. Under FLASK_DEBUG=1 Flask's default
+# is kept, so they still reach the interactive debugger.
+if os.environ.get("FLASK_DEBUG") != "1":
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+
+# Years and semesters offered on the index page. Each one has its own
+# data.json, cache entry and stats counters, so nothing else is accepted.
+YEARS = ("1", "2", "3")
+SEMESTERS = ("odd", "even")
 
 # S3 Configuration
 S3_BUCKET = "notesdk"
 S3_REGION = "ap-south-1"
 USERS_DB_KEY = "users/users.db"
 
+# Each contact submission is its own object under CONTACTS_PREFIX;
+# LEGACY_CONTACTS_KEY is the single file older submissions were appended to
+CONTACTS_PREFIX = "contacts/submissions/"
+LEGACY_CONTACTS_KEY = "contacts/submissions.json"
+CONTACTS_FETCH_WORKERS = 16
+
+# Contact form fields, all required, copied into each stored submission
+CONTACT_FIELDS = ('name', 'email', 'year', 'section', 'subject', 'message')
+
+# Fields /api/register-user requires
+USER_FIELDS = ('department', 'year', 'section', 'name', 'email')
+
+# Most keys DeleteObjects accepts in one request
+S3_DELETE_BATCH_SIZE = 1000
+
+# Large uploads/downloads (up to MAX_CONTENT_LENGTH) move in 8MB parts
+# transferred in parallel rather than one after another
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+
+# Seconds between flushes of the batched visit/download counters into data.json
+STATS_FLUSH_INTERVAL = 30
+
+# JSON bodies at least this large are stored gzip-compressed; level 3 gets
+# most of level 9's ratio on JSON at a fraction of the CPU
+JSON_GZIP_MIN_SIZE = 1024
+JSON_GZIP_LEVEL = 3
+
+# Seconds the student-facing pages may serve a cached data.json without
+# asking S3 whether it changed; admin pages always revalidate
+DATA_CACHE_TTL = 30
+
 # Create temp directory if it doesn't exist
-import tempfile
 TEMP_DIR = tempfile.gettempdir()
 TEMP_DB_PATH = os.path.join(TEMP_DIR, "notes_dock_users.db")
 
-# Initialize S3 client
-try:
-    S3_CLIENT = boto3.client("s3", region_name=S3_REGION)
-    print(f"✅ S3 initialized: Bucket={S3_BUCKET}, Region={S3_REGION}")
-    S3_CLIENT.head_bucket(Bucket=S3_BUCKET)
-    print(f"✅ S3 bucket '{S3_BUCKET}' is accessible")
-except ClientError as e:
-    print(f"❌ S3 initialization failed: {e}")
-    S3_CLIENT = None
-except Exception as e:
-    print(f"❌ Unexpected error during S3 initialization: {e}")
-    S3_CLIENT = None
+# Seconds to wait after a write before pushing the database to S3, so that
+# bursts of registrations collapse into a single upload
+DB_UPLOAD_DELAY = 5
+
+# Idle read connections kept open for reuse
+DB_POOL_MAX_READERS = 4
+
+# Registrations are committed in batches of up to USER_BATCH_SIZE rows,
+# gathered for at most USER_BATCH_WINDOW seconds
+USER_BATCH_SIZE = 100
+USER_BATCH_WINDOW = 0.2
+
+# One client per process, shared by every thread (boto3 clients are
+# thread-safe). Its connection pool is sized for parallel transfers, the
+# contacts fan-out and concurrent requests rather than botocore's default 10:
+# at least one connection per gunicorn thread (see gunicorn.conf.py).
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True,
+)
+
+# S3 client, created on first use so that importing the app (and forking
+# workers from it) doesn't set up connections or hit the network. Creation
+# is locked: building clients from boto3's default session at the same time
+# from several threads is not safe.
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client("s3", region_name=S3_REGION, config=S3_CLIENT_CONFIG)
+                log.info("S3 initialized: Bucket=%s, Region=%s", S3_BUCKET, S3_REGION)
+    return _s3_client
 
 # Admin credentials
+#
+# Set ADMIN_N_PASSWORD_HASH to a hash generated once offline with
+#   python -c "from werkzeug.security import generate_password_hash; print(generate_password_hash('...'))"
+# so workers don't spend startup time hashing. ADMIN_N_PASSWORD is still
+# accepted as a fallback and hashed at import.
+def admin_password_hash(n):
+    password_hash = os.getenv(f"ADMIN_{n}_PASSWORD_HASH")
+    if password_hash:
+        return password_hash
+    return generate_password_hash(os.getenv(f"ADMIN_{n}_PASSWORD"))
+
 ADMIN_CREDENTIALS = {
     "year_1": {
         "username": os.getenv("ADMIN_1_USERNAME"),
-        "password": generate_password_hash(os.getenv("ADMIN_1_PASSWORD"))
+        "password": admin_password_hash(1)
     },
     "year_2": {
         "username": os.getenv("ADMIN_2_USERNAME"),
-        "password": generate_password_hash(os.getenv("ADMIN_2_PASSWORD"))
+        "password": admin_password_hash(2)
     },
     "year_3": {
         "username": os.getenv("ADMIN_3_USERNAME"),
-        "password": generate_password_hash(os.getenv("ADMIN_3_PASSWORD"))
+        "password": admin_password_hash(3)
     },
 }
 
+# Failed admin logins allowed per client IP within ADMIN_LOGIN_WINDOW
+# seconds; further attempts are refused before any password hashing
+ADMIN_LOGIN_MAX_FAILURES = 5
+ADMIN_LOGIN_WINDOW = 300
+
+_login_failures = {}
+_login_failures_lock = threading.Lock()
+_login_failures_swept_at = time.monotonic()
+
+def login_blocked(client_ip):
+    now = time.monotonic()
+    with _login_failures_lock:
+        recent = [t for t in _login_failures.get(client_ip, []) if now - t < ADMIN_LOGIN_WINDOW]
+        if recent:
+            _login_failures[client_ip] = recent
+        else:
+            _login_failures.pop(client_ip, None)
+        return len(recent) >= ADMIN_LOGIN_MAX_FAILURES
+
+def record_login_failure(client_ip):
+    global _login_failures_swept_at
+    now = time.monotonic()
+    with _login_failures_lock:
+        _login_failures.setdefault(client_ip, []).append(now)
+        # Once per window, forget IPs whose latest failure has expired, so
+        # clients that never come back don't stay in memory
+        if now - _login_failures_swept_at >= ADMIN_LOGIN_WINDOW:
+            _login_failures_swept_at = now
+            for ip in [ip for ip, times in _login_failures.items() if now - times[-1] >= ADMIN_LOGIN_WINDOW]:
+                del _login_failures[ip]
+
 # ==================== USER DATABASE FUNCTIONS ====================
 
+def merge_duplicate_users(cursor):
+    """Fold rows that differ only by case into the oldest one, summing their
+    counts, so the case-insensitive identity index can be created"""
+    cursor.execute('''
+        CREATE TEMP TABLE merged_users AS
+        SELECT MIN(id) AS id, SUM(count) AS count, MAX(updated_at) AS updated_at
+        FROM users
+        GROUP BY LOWER(email), LOWER(name), LOWER(department), year, UPPER(section)
+    ''')
+    cursor.execute('''
+        DELETE FROM users WHERE id NOT IN (SELECT id FROM merged_users)
+    ''')
+    merged = cursor.rowcount
+    if merged:
+        cursor.execute('''
+            UPDATE users SET
+                count = (SELECT count FROM merged_users WHERE merged_users.id = users.id),
+                updated_at = (SELECT updated_at FROM merged_users WHERE merged_users.id = users.id)
+        ''')
+        log.warning("Merged %s duplicate user rows", merged)
+    cursor.execute('DROP TABLE merged_users')
+
 def init_db():
     """Initialize SQLite database schema"""
     try:
@@ -102,255 +286,518 @@ def init_db():
                 UNIQUE(department, year, section, name, email)
             )
         ''')
+
+        # Identifies a user case-insensitively; UPSERT_USER_SQL conflicts on
+        # it, which the case-sensitive UNIQUE constraint cannot do
+        has_identity_index = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_users_identity'"
+        ).fetchone()
+        if not has_identity_index:
+            merge_duplicate_users(cursor)
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_users_identity
+            ON users(LOWER(email), LOWER(name), LOWER(department), year, UPPER(section))
+        ''')
         
         conn.commit()
         conn.close()
-        print(f"✅ Database initialized at: {TEMP_DB_PATH}")
-    except Exception as e:
-        print(f"❌ Error initializing database: {e}")
+        log.info("Database initialized at: %s", TEMP_DB_PATH)
+    except Exception:
+        log.exception("Error initializing database")
         raise
 
 def download_db_from_s3():
     """Download database from S3 to local temp file"""
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
-    
+    download_path = TEMP_DB_PATH + ".download"
     try:
-        S3_CLIENT.download_file(S3_BUCKET, USERS_DB_KEY, TEMP_DB_PATH)
-        print(f"✅ Downloaded database from S3")
+        get_s3_client().download_file(S3_BUCKET, USERS_DB_KEY, download_path)
+        # A -wal/-shm pair left by an earlier run belongs to the old file and
+        # must not be replayed into the downloaded one
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(TEMP_DB_PATH + suffix):
+                os.remove(TEMP_DB_PATH + suffix)
+        os.replace(download_path, TEMP_DB_PATH)
+        log.info("Downloaded database from S3")
         return True
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "")
         if error_code == "404" or error_code == "NoSuchKey":
-            print(f"ℹ️  Database not found in S3, creating new")
-            init_db()
+            log.info("Database not found in S3, creating new")
             return False
-        print(f"❌ S3 download failed: {e}")
+        log.exception("S3 download failed")
         raise Exception(f"Failed to download database from S3: {str(e)}")
+    finally:
+        if os.path.exists(download_path):
+            os.remove(download_path)
+
+# Held for a whole upload: the background uploader and the exit flush
+# share one snapshot path
+_db_upload_lock = threading.RLock()
 
 def upload_db_to_s3():
     """Upload database to S3"""
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
-    
-    try:
-        S3_CLIENT.upload_file(TEMP_DB_PATH, S3_BUCKET, USERS_DB_KEY)
-        print(f"✅ Uploaded database to S3")
-        return True
-    except ClientError as e:
-        print(f"❌ S3 upload failed: {e}")
-        raise Exception(f"Failed to upload database to S3: {str(e)}")
+    # In WAL mode recent commits may still live in the -wal file, so upload a
+    # consistent snapshot taken with the backup API instead of the raw file
+    snapshot_path = TEMP_DB_PATH + ".upload"
+    with _db_upload_lock:
+        try:
+            source = sqlite3.connect(TEMP_DB_PATH, timeout=10)
+            snapshot = sqlite3.connect(snapshot_path)
+            try:
+                source.backup(snapshot)
+            finally:
+                snapshot.close()
+                source.close()
+
+            get_s3_client().upload_file(snapshot_path, S3_BUCKET, USERS_DB_KEY)
+            log.info("Uploaded database to S3")
+            return True
+        except ClientError as e:
+            log.exception("S3 upload failed")
+            raise Exception(f"Failed to upload database to S3: {str(e)}")
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+def ensure_local_db():
+    """Fetch the database from S3 once per process; the local file is used afterwards"""
+    global _db_ready
+    if _db_ready:
+        return
+
+    with _db_ready_lock:
+        if _db_ready:
+            return
 
-def get_db_connection():
-    """Get database connection, ensuring latest version is downloaded"""
-    try:
         # Ensure directory exists
         db_dir = os.path.dirname(TEMP_DB_PATH)
         os.makedirs(db_dir, exist_ok=True)
-        
-        # Try to download from S3
+
+        # S3 holds the shared copy, and another host may have uploaded since
+        # any file left here was written, so fetch it once per process
         try:
             download_db_from_s3()
         except Exception as e:
-            print(f"Could not download from S3, creating new: {e}")
-            # If download fails, create new db
-            if not os.path.exists(TEMP_DB_PATH):
-                init_db()
-    
-        conn = sqlite3.connect(TEMP_DB_PATH, timeout=10)
+            log.warning("Could not download from S3, using local database: %s", e)
+
+        # Creates the schema for a new database and adds any missing
+        # indexes to one downloaded from S3
+        init_db()
+
+        _db_ready = True
+
+# Set while the local database has writes S3 hasn't seen yet
+_db_dirty = threading.Event()
+
+def schedule_db_upload():
+    """Mark the local database for a debounced upload to S3"""
+    _db_dirty.set()
+
+def _upload_db_if_dirty():
+    with _db_upload_lock:
+        if not _db_dirty.is_set():
+            return
+        # Cleared first, so writes made during the upload mark it again
+        _db_dirty.clear()
+        try:
+            upload_db_to_s3()
+        except Exception:
+            _db_dirty.set()
+            raise
+
+def _db_upload_worker():
+    while True:
+        _db_dirty.wait()
+        # Everything written while we sleep is covered by this upload
+        time.sleep(DB_UPLOAD_DELAY)
+        try:
+            _upload_db_if_dirty()
+        except Exception:
+            log.exception("Background database upload failed")
+
+def flush_db_upload():
+    """Upload immediately if an upload is still pending (used at shutdown)"""
+    try:
+        _upload_db_if_dirty()
+    except Exception:
+        log.exception("Final database upload failed")
+
+threading.Thread(target=_db_upload_worker, name="db-uploader", daemon=True).start()
+atexit.register(flush_db_upload)
+
+def get_db_connection():
+    """Get a connection to the local database"""
+    try:
+        ensure_local_db()
+
+        # Pooled connections are handed between request threads
+        conn = sqlite3.connect(TEMP_DB_PATH, timeout=10, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the writer instead of queueing on the
+        # global lock; busy_timeout makes writers wait rather than fail
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
         return conn
     except Exception as e:
-        print(f"❌ Error connecting to database: {e}")
+        log.exception("Error connecting to database")
         raise Exception(f"Database connection error: {str(e)}")
 
-def add_or_update_user(department, year, section, name, email):
-    """Add new user or update count if exists"""
+class SqlitePool:
+    """Reusable SQLite connections: a LIFO stack of readers and a single writer"""
+
+    def __init__(self, max_readers):
+        self.max_readers = max_readers
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    @contextmanager
+    def read(self):
+        with self._readers_lock:
+            conn = self._readers.pop() if self._readers else None
+        if conn is None:
+            conn = get_db_connection()
+            conn.execute("PRAGMA query_only=1")
+
+        try:
+            yield conn
+        finally:
+            # Most recently used connection goes back on top so its page
+            # cache stays warm; extras beyond the limit are closed
+            with self._readers_lock:
+                if len(self._readers) < self.max_readers:
+                    self._readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    @contextmanager
+    def write(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = get_db_connection()
+
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+DB_POOL = SqlitePool(DB_POOL_MAX_READERS)
+
+def get_read_conn():
+    """Borrow a read-only connection from the pool"""
+    return DB_POOL.read()
+
+def get_write_conn():
+    """Borrow the writer connection; commits on success, rolls back on error"""
+    return DB_POOL.write()
+
+# Inserts a new user or bumps the count of the existing one in a single
+# statement; count comes back as 1 only for a new row
+UPSERT_USER_SQL = '''
+    INSERT INTO users (department, year, section, name, email, count)
+    VALUES (?, ?, ?, ?, ?, 1)
+    ON CONFLICT(LOWER(email), LOWER(name), LOWER(department), year, UPPER(section))
+    DO UPDATE SET count = count + 1, updated_at = CURRENT_TIMESTAMP
+    RETURNING count
+'''
+
+_user_write_queue = queue.Queue()
+
+def _write_user_batch(batch):
+    """Upsert a batch of (params, future) pairs in one transaction"""
+    results = []
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute('''
-            SELECT * FROM users 
-            WHERE LOWER(department) = LOWER(?)
-            AND year = ?
-            AND UPPER(section) = UPPER(?)
-            AND LOWER(name) = LOWER(?)
-            AND LOWER(email) = LOWER(?)
-        ''', (department, int(year), section, name, email))
-        
-        existing_user = cursor.fetchone()
-        
-        if existing_user:
-            # User exists, increment count
-            cursor.execute('''
-                UPDATE users 
-                SET count = count + 1, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (existing_user['id'],))
-            print(f"✅ Updated user visit count: {name}")
-            result = {'created': False, 'message': 'User updated'}
-        else:
-            # User doesn't exist, create new entry
-            cursor.execute('''
-                INSERT INTO users (department, year, section, name, email, count)
-                VALUES (?, ?, ?, ?, ?, 1)
-            ''', (department, int(year), section.upper(), name, email))
-            print(f"✅ Added new user: {name}")
-            result = {'created': True, 'message': 'New user created'}
-        
-        conn.commit()
-        conn.close()
-        
-        # Upload updated database to S3
-        upload_db_to_s3()
-        
-        return result
-    except sqlite3.IntegrityError as e:
-        print(f"Database integrity error: {e}")
-        return {'created': False, 'message': 'User update failed'}
+        with get_write_conn() as conn:
+            for params, future in batch:
+                # A failing row only rolls back its own statement
+                try:
+                    count = conn.execute(UPSERT_USER_SQL, params).fetchone()['count']
+                    results.append((future, count, None))
+                except sqlite3.Error as e:
+                    results.append((future, None, e))
     except Exception as e:
-        print(f"Error adding/updating user: {e}")
-        raise Exception(f"Failed to process user: {str(e)}")
+        for _, future in batch:
+            future.set_exception(e)
+        return
+
+    for future, count, error in results:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(count)
+
+    # Upload updated database to S3 in the background
+    schedule_db_upload()
+
+def _user_writer_worker():
+    # None on the queue means stop once everything before it is written
+    stopping = False
+    while not stopping:
+        item = _user_write_queue.get()
+        if item is None:
+            return
+        batch = [item]
+        deadline = time.monotonic() + USER_BATCH_WINDOW
+        while len(batch) < USER_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _user_write_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        _write_user_batch(batch)
+
+_user_writer = threading.Thread(target=_user_writer_worker, name="user-writer", daemon=True)
+_user_writer.start()
+
+def flush_user_writes():
+    """Write every queued registration (used at shutdown)"""
+    _user_write_queue.put(None)
+    _user_writer.join(timeout=10)
+
+# atexit runs hooks in reverse, so this finishes before flush_db_upload
+# uploads the database
+atexit.register(flush_user_writes)
+
+def queue_user_registration(department, year, section, name, email):
+    """Queue an add/update for the writer thread; returns a Future of the new count"""
+    future = Future()
+    _user_write_queue.put(((department, int(year), section.upper(), name, email), future))
+    return future
+
+def _log_registration_result(name, future):
+    error = future.exception()
+    if error is not None:
+        log.error("Error adding/updating user %s: %s", name, error)
+    elif future.result() == 1:
+        log.debug("Added new user: %s", name)
+    else:
+        log.debug("Updated user visit count: %s", name)
 
 def get_all_users_sorted():
     """Get all users sorted by year and section"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with get_read_conn() as conn:
+            cursor = conn.cursor()
+
+            # Query sorted by year ASC, section ASC (A before B)
+            cursor.execute('''
+                SELECT id, department, year, section, name, email, count, 
+                       created_at, updated_at
+                FROM users
+                ORDER BY year ASC, section ASC, name ASC
+            ''')
+
+            users = cursor.fetchall()
         
-        # Query sorted by year ASC, section ASC (A before B)
+        return users
+    except Exception:
+        log.exception("Error fetching users")
+        return []
+
+class Echo:
+    """File-like object whose write() hands the formatted line straight back"""
+
+    def write(self, value):
+        return value
+
+def export_users_to_csv():
+    """Export users database to CSV format, yielding one line at a time.
+    The query runs before the header line is yielded."""
+    writer = csv.writer(Echo())
+
+    with get_read_conn() as conn:
+        # Plain tuples in CSV column order, so each row is written as-is
+        cursor = conn.cursor()
+        cursor.row_factory = None
         cursor.execute('''
-            SELECT id, department, year, section, name, email, count, 
-                   created_at, updated_at
+            SELECT department, year, section, name, email, count
             FROM users
             ORDER BY year ASC, section ASC, name ASC
         ''')
-        
-        users = cursor.fetchall()
-        conn.close()
-        
-        return users
-    except Exception as e:
-        print(f"Error fetching users: {e}")
-        return []
+        yield writer.writerow(['S.no', 'Department', 'Year', 'Section', 'Name', 'Email', 'Count'])
 
-def export_users_to_csv():
-    """Export users database to CSV format"""
-    try:
-        users = get_all_users_sorted()
-        
-        output = StringIO()
-        fieldnames = ['S.no', 'Department', 'Year', 'Section', 'Name', 'Email', 'Count']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        
-        writer.writeheader()
-        for idx, user in enumerate(users, 1):
-            writer.writerow({
-                'S.no': idx,
-                'Department': user['department'],
-                'Year': user['year'],
-                'Section': user['section'],
-                'Name': user['name'],
-                'Email': user['email'],
-                'Count': user['count']
-            })
-        
-        return output.getvalue()
-    except Exception as e:
-        print(f"Error exporting users: {e}")
-        return None
+        # Iterate the cursor rather than fetchall() so memory stays flat
+        for idx, user in enumerate(cursor, 1):
+            yield writer.writerow((idx, *user))
 
 # ==================== EXISTING FUNCTIONS ====================
 
 def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition(".")
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
 
+# Pure function of short strings; the same keys recur across requests
+@lru_cache(maxsize=4096)
 def get_s3_key(year, semester, filename):
     return f"year_{year}/{semester}sem/{filename}"
 
 def s3_upload_fileobj(file_obj, bucket, key):
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
     try:
-        S3_CLIENT.upload_fileobj(file_obj, bucket, key)
-        print(f"✅ Uploaded to S3: {key}")
+        get_s3_client().upload_fileobj(file_obj, bucket, key, Config=S3_TRANSFER_CONFIG)
+        log.debug("Uploaded to S3: %s", key)
         return True
     except ClientError as e:
-        print(f"❌ S3 upload failed: {e}")
+        log.exception("S3 upload failed")
         raise Exception(f"Failed to upload file to S3: {str(e)}")
 
-def s3_download_fileobj(bucket, key):
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
+def attachment_names(filename):
+    """Content-Disposition filename parameters, built the way send_file does:
+    non-ASCII names get an ASCII fallback plus an RFC 5987 filename*"""
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        return {"filename": simple, "filename*": f"UTF-8''{quoted}"}
+    return {"filename": filename}
+
+def s3_open_object(bucket, key):
+    """Open an S3 object for streaming; returns the get_object response"""
     try:
-        file_obj = BytesIO()
-        S3_CLIENT.download_fileobj(bucket, key, file_obj)
-        file_obj.seek(0)
-        print(f"✅ Downloaded from S3: {key}")
-        return file_obj
+        response = get_s3_client().get_object(Bucket=bucket, Key=key)
+        log.debug("Opened S3 object: %s", key)
+        return response
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "")
         if error_code == "404" or error_code == "NoSuchKey":
-            print(f"⚠️  File not found in S3: {key}")
+            log.warning("File not found in S3: %s", key)
             return None
-        print(f"❌ S3 download failed: {e}")
+        log.exception("S3 download failed")
         raise Exception(f"Failed to download file from S3: {str(e)}")
 
+def stream_s3_body(body, chunk_size=64 * 1024):
+    """Yield an S3 body in chunks, closing the connection when done"""
+    try:
+        yield from body.iter_chunks(chunk_size=chunk_size)
+    finally:
+        body.close()
+
 def s3_delete_file(bucket, key):
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
     try:
-        S3_CLIENT.delete_object(Bucket=bucket, Key=key)
-        print(f"✅ Deleted from S3: {key}")
+        get_s3_client().delete_object(Bucket=bucket, Key=key)
+        log.debug("Deleted from S3: %s", key)
         return True
-    except ClientError as e:
-        print(f"❌ S3 delete failed: {e}")
+    except ClientError:
+        log.exception("S3 delete failed")
         return False
 
-def s3_upload_json(bucket, key, data):
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
+def s3_delete_files(bucket, keys):
+    """Delete several objects with as few DeleteObjects requests as possible"""
+    errors = []
     try:
-        json_bytes = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
-        S3_CLIENT.put_object(
-            Bucket=bucket, Key=key, Body=json_bytes, ContentType="application/json"
+        for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+            # Quiet mode only reports failures, keeping the response small
+            response = get_s3_client().delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            errors.extend(response.get("Errors", []))
+        for error in errors:
+            log.error("S3 delete failed: %s: %s", error.get('Key'), error.get('Message'))
+        log.debug("Deleted %s objects from S3", len(keys) - len(errors))
+        return not errors
+    except ClientError:
+        log.exception("S3 delete failed")
+        return False
+
+# Raw JSON bodies by (bucket, key) with the ETag they were read or written
+# with and when that was; reads send If-None-Match and reuse the cached body
+# on a 304, or skip S3 entirely while the entry is younger than max_age.
+# Pass cache=False for write-once objects that would only fill it up.
+_json_cache = {}
+
+def s3_upload_json(bucket, key, data, cache=True):
+    try:
+        json_bytes = orjson.dumps(data)
+        extra_args = {}
+        body = json_bytes
+        if len(json_bytes) >= JSON_GZIP_MIN_SIZE:
+            body = gzip.compress(json_bytes, compresslevel=JSON_GZIP_LEVEL)
+            extra_args["ContentEncoding"] = "gzip"
+        response = get_s3_client().put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=body,
+            ContentType="application/json",
+            **extra_args,
         )
-        print(f"✅ Uploaded JSON to S3: {key}")
+        if cache:
+            _json_cache[(bucket, key)] = (response["ETag"], json_bytes, time.monotonic())
+        log.debug("Uploaded JSON to S3: %s", key)
         return True
     except ClientError as e:
-        print(f"❌ S3 JSON upload failed: {e}")
+        _json_cache.pop((bucket, key), None)
+        log.exception("S3 JSON upload failed")
         raise Exception(f"Failed to upload JSON to S3: {str(e)}")
 
-def s3_download_json(bucket, key):
-    if not S3_CLIENT:
-        raise Exception("S3 client not initialized")
+def s3_download_json(bucket, key, max_age=0, cache=True):
+    cached = _json_cache.get((bucket, key))
+    if cached and time.monotonic() - cached[2] < max_age:
+        return orjson.loads(cached[1])
     try:
-        response = S3_CLIENT.get_object(Bucket=bucket, Key=key)
-        data = json.loads(response["Body"].read().decode("utf-8"))
-        print(f"✅ Downloaded JSON from S3: {key}")
-        return data
+        if cached:
+            response = get_s3_client().get_object(Bucket=bucket, Key=key, IfNoneMatch=cached[0])
+        else:
+            response = get_s3_client().get_object(Bucket=bucket, Key=key)
+        json_bytes = response["Body"].read()
+        if response.get("ContentEncoding") == "gzip":
+            json_bytes = gzip.decompress(json_bytes)
+        if cache:
+            _json_cache[(bucket, key)] = (response["ETag"], json_bytes, time.monotonic())
+        log.debug("Downloaded JSON from S3: %s", key)
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "")
-        if error_code == "404" or error_code == "NoSuchKey":
-            print(f"ℹ️  JSON file not found in S3, creating new: {key}")
+        if cached and (error_code == "304" or error_code == "NotModified"):
+            json_bytes = cached[1]
+            _json_cache[(bucket, key)] = (cached[0], json_bytes, time.monotonic())
+        elif error_code == "404" or error_code == "NoSuchKey":
+            _json_cache.pop((bucket, key), None)
+            log.debug("JSON file not found in S3: %s", key)
             return None
-        print(f"❌ S3 JSON download failed: {e}")
-        raise Exception(f"Failed to download JSON from S3: {str(e)}")
-
-def load_data(year, semester):
-    if not S3_CLIENT:
-        raise Exception("S3 is not available. Cannot load data.")
-
+        else:
+            log.exception("S3 JSON download failed")
+            raise Exception(f"Failed to download JSON from S3: {str(e)}")
+    return orjson.loads(json_bytes)
+
+_now_iso_cache = (0, "")
+
+def now_iso():
+    """Current UTC time in ISO format, re-formatted at most once per second"""
+    global _now_iso_cache
+    second = int(time.time())
+    cached_second, formatted = _now_iso_cache
+    if second != cached_second:
+        formatted = datetime.fromtimestamp(second, tz=timezone.utc).isoformat()
+        _now_iso_cache = (second, formatted)
+    return formatted
+
+def load_data(year, semester, max_age=0):
     data_key = get_s3_key(year, semester, "data.json")
 
     try:
-        data = s3_download_json(S3_BUCKET, data_key)
+        data = s3_download_json(S3_BUCKET, data_key, max_age=max_age)
         if data:
-            return data
-    except Exception as e:
-        print(f"Error loading data: {e}")
+            return index_data(data)
+        log.info("Data file not found in S3, creating new: %s", data_key)
+    except Exception:
+        log.exception("Error loading data")
 
     default_data = {
         "subjects": [],
@@ -360,23 +807,69 @@ def load_data(year, semester):
             "total_visits": 0,
             "total_downloads": 0,
             "storage_used": "0 MB",
-            "last_updated": datetime.now().isoformat(),
+            "last_updated": now_iso(),
         },
     }
 
     try:
         save_data(year, semester, default_data)
     except Exception as e:
-        print(f"Warning: Could not create default data file: {e}")
+        log.warning("Could not create default data file: %s", e)
+
+    return index_data(default_data)
+
+def index_data(data):
+    """Attach subject lookup tables; keys starting with "_" are not saved"""
+    subjects = data["subjects"]
+    data["_by_id"] = {subject["id"]: subject for subject in subjects}
+    data["_names"] = {subject["name"].lower() for subject in subjects}
+    data["_units_by_id"] = {}
+    return data
+
+def filename_in_use(data, filename):
+    """True if any unit in data points at filename"""
+    return any(
+        unit.get("filename") == filename
+        for subject in data["subjects"]
+        for unit in subject.get("units", [])
+    )
 
-    return default_data
+def find_unit(data, subject_id, unit_id):
+    """Look up a unit, indexing only the units of the subject asked for"""
+    units_by_id = data["_units_by_id"].get(subject_id)
+    if units_by_id is None:
+        subject = data["_by_id"].get(subject_id)
+        if not subject:
+            return None
+        units_by_id = {unit["id"]: unit for unit in subject.get("units", [])}
+        data["_units_by_id"][subject_id] = units_by_id
+    return units_by_id.get(unit_id)
+
+# Admin edits and the stats flush both load, modify and save a whole
+# data.json; holding its lock from load to save keeps one writer from
+# overwriting another's changes with a stale copy
+_data_locks = {}
+_data_locks_lock = threading.Lock()
+
+def data_lock(year, semester):
+    with _data_locks_lock:
+        return _data_locks.setdefault((year, semester), threading.Lock())
+
+@contextmanager
+def editing_data(year, semester):
+    """Load data.json under its lock; the caller saves before leaving the block.
+    Keep slow S3 file transfers outside it."""
+    with data_lock(year, semester):
+        yield load_data(year, semester)
 
 def save_data(year, semester, data):
-    if not S3_CLIENT:
-        raise Exception("S3 is not available. Cannot save data.")
-
+    counters = {}
     if "stats" in data:
-        data["stats"]["last_updated"] = datetime.now().isoformat()
+        counters = _take_pending_stats(year, semester)
+        for stat, count in counters.items():
+            data["stats"][stat] = data["stats"].get(stat, 0) + count
+
+        data["stats"]["last_updated"] = now_iso()
         data["stats"]["total_subjects"] = len(data.get("subjects", []))
         total_files = sum(
             len(subject.get("units", [])) for subject in data.get("subjects", [])
@@ -384,7 +877,132 @@ def save_data(year, semester, data):
         data["stats"]["total_files"] = total_files
 
     data_key = get_s3_key(year, semester, "data.json")
-    s3_upload_json(S3_BUCKET, data_key, data)
+    payload = {key: value for key, value in data.items() if not key.startswith("_")}
+    try:
+        s3_upload_json(S3_BUCKET, data_key, payload)
+    except Exception:
+        _restore_pending_stats(year, semester, counters)
+        raise
+
+# Visit and download counters are kept in memory and folded into data.json
+# by the next save, instead of rewriting the file for every page view
+_pending_stats = {}
+_pending_stats_lock = threading.Lock()
+
+def bump_stat(year, semester, stat):
+    with _pending_stats_lock:
+        counters = _pending_stats.setdefault((year, semester), {})
+        counters[stat] = counters.get(stat, 0) + 1
+
+def _take_pending_stats(year, semester):
+    with _pending_stats_lock:
+        return _pending_stats.pop((year, semester), {})
+
+def _restore_pending_stats(year, semester, counters):
+    if not counters:
+        return
+    with _pending_stats_lock:
+        pending = _pending_stats.setdefault((year, semester), {})
+        for stat, count in counters.items():
+            pending[stat] = pending.get(stat, 0) + count
+
+def flush_pending_stats():
+    """Write every pending counter to its data.json"""
+    with _pending_stats_lock:
+        keys = list(_pending_stats)
+
+    for year, semester in keys:
+        try:
+            with data_lock(year, semester):
+                save_data(year, semester, load_data(year, semester))
+        except Exception as e:
+            log.error("Failed to flush stats for year %s %s: %s", year, semester, e)
+
+def _stats_flush_worker():
+    while True:
+        time.sleep(STATS_FLUSH_INTERVAL)
+        flush_pending_stats()
+
+threading.Thread(target=_stats_flush_worker, name="stats-flusher", daemon=True).start()
+atexit.register(flush_pending_stats)
+
+def list_contact_submissions():
+    """Fetch every contact submission, newest first"""
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    keys = [
+        obj["Key"]
+        for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=CONTACTS_PREFIX)
+        for obj in page.get("Contents", [])
+    ]
+
+    with ThreadPoolExecutor(max_workers=CONTACTS_FETCH_WORKERS) as executor:
+        submissions = [
+            submission
+            for submission in executor.map(
+                lambda key: s3_download_json(S3_BUCKET, key, cache=False), keys
+            )
+            if submission
+        ]
+
+    legacy = s3_download_json(S3_BUCKET, LEGACY_CONTACTS_KEY, cache=False)
+    if legacy:
+        submissions.extend(legacy.get("submissions", []))
+
+    submissions.sort(key=lambda submission: submission.get("created_at", ""), reverse=True)
+    return submissions
+
+def update_session(**values):
+    """Set session values, leaving the session unmodified if none changed.
+    Returns True if anything was written."""
+    # Any assignment marks the cookie session modified, which re-signs it
+    # and sends a new Set-Cookie with the response
+    current = session._get_current_object()
+    changed = False
+    for key, value in values.items():
+        if current.get(key) != value:
+            current[key] = value
+            changed = True
+    return changed
+
+def session_values(*keys):
+    """Read several session keys, resolving the session proxy only once"""
+    current = session._get_current_object()
+    return [current.get(key) for key in keys]
+
+# Constant JSON error bodies, serialized once. Each use still gets its own
+# Response, since Flask mutates it on the way out (session cookie, headers).
+NOT_AUTHORIZED_JSON = orjson.dumps({"success": False, "message": "Not authorized"})
+SUBJECT_ID_REQUIRED_JSON = orjson.dumps({"success": False, "message": "Subject ID is required"})
+SUBJECT_NOT_FOUND_JSON = orjson.dumps({"success": False, "message": "Subject not found"})
+UNIT_NOT_FOUND_JSON = orjson.dumps({"success": False, "message": "Unit not found"})
+
+def json_body_response(body, status=200):
+    """Wrap an already-serialized JSON body in a response"""
+    return Response(body, status=status, mimetype="application/json")
+
+def missing_fields_response(data, fields):
+    """Return a 400 response naming any empty fields, or None if all are set"""
+    missing = [field for field in fields if not data.get(field)]
+    if missing:
+        return jsonify({
+            'success': False,
+            'message': f'Missing required field: {", ".join(missing)}'
+        }), 400
+    return None
+
+def require_admin(view):
+    """Reject non-admins, then call the view with the admin's (year, semester)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        logged_in, admin_year, year, semester = session_values(
+            "admin_logged_in", "admin_year", "year", "semester"
+        )
+        if not logged_in:
+            return json_body_response(NOT_AUTHORIZED_JSON)
+
+        return view(admin_year or year, semester, *args, **kwargs)
+
+    return wrapper
 
 # ==================== ROUTES ====================
 
@@ -392,11 +1010,10 @@ def save_data(year, semester, data):
 def test_db():
     """Test database connection"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        result = cursor.fetchone()
-        conn.close()
+        with get_read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) as count FROM users")
+            result = cursor.fetchone()
         
         return jsonify({
             'success': True,
@@ -428,13 +1045,9 @@ def register_user():
     try:
         data = request.json
         
-        required_fields = ['department', 'year', 'section', 'name', 'email']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'message': f'Missing required field: {field}'
-                }), 400
+        error = missing_fields_response(data, USER_FIELDS)
+        if error:
+            return error
         
         department = data.get('department')
         year = data.get('year')
@@ -442,20 +1055,25 @@ def register_user():
         name = data.get('name')
         email = data.get('email')
         
-        result = add_or_update_user(department, year, section, name, email)
+        # The write and the S3 upload both happen in the background; the
+        # response doesn't wait for either
+        future = queue_user_registration(department, year, section, name, email)
+        future.add_done_callback(lambda f: _log_registration_result(name, f))
         
-        session['department'] = department
-        session['year'] = year
-        session['section'] = section
-        session['name'] = name
-        session['email'] = email
+        update_session(
+            department=department,
+            year=year,
+            section=section,
+            name=name,
+            email=email,
+        )
         
         return jsonify({
             'success': True,
-            'message': result['message']
+            'message': 'User registered'
         })
     except Exception as e:
-        print(f"Error registering user: {e}")
+        log.exception("Error registering user")
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
@@ -466,26 +1084,19 @@ def export_users_csv():
     """Export users database as CSV file"""
     try:
         if not session.get("admin_logged_in"):
-            return jsonify({
-                'success': False,
-                'message': 'Not authorized'
-            }), 403
+            return json_body_response(NOT_AUTHORIZED_JSON, 403)
         
-        csv_content = export_users_to_csv()
-        
-        if csv_content:
-            from flask import make_response
-            response = make_response(csv_content)
-            response.headers["Content-Disposition"] = "attachment; filename=users_export.csv"
-            response.headers["Content-Type"] = "text/csv"
-            return response
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to export users'
-            }), 500
+        lines = export_users_to_csv()
+        # Opens the database and runs the query now, so failures get the
+        # JSON 500 below instead of a truncated 200
+        header = next(lines)
+        return Response(
+            stream_with_context(chain((header,), lines)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=users_export.csv"},
+        )
     except Exception as e:
-        print(f"Error exporting users: {e}")
+        log.exception("Error exporting users")
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
@@ -496,10 +1107,7 @@ def get_users():
     """Get all users sorted by year and section (for admin dashboard)"""
     try:
         if not session.get("admin_logged_in"):
-            return jsonify({
-                'success': False,
-                'message': 'Not authorized'
-            }), 403
+            return json_body_response(NOT_AUTHORIZED_JSON, 403)
         
         users = get_all_users_sorted()
         users_list = [dict(user) for user in users]
@@ -513,7 +1121,25 @@ def get_users():
             'users': users_list
         })
     except Exception as e:
-        print(f"Error fetching users: {e}")
+        log.exception("Error fetching users")
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@app.route("/api/get-contacts")
+def get_contacts():
+    """Get all contact form submissions, newest first (for admin dashboard)"""
+    try:
+        if not session.get("admin_logged_in"):
+            return json_body_response(NOT_AUTHORIZED_JSON, 403)
+
+        return jsonify({
+            'success': True,
+            'submissions': list_contact_submissions()
+        })
+    except Exception as e:
+        log.exception("Error fetching contact submissions")
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
@@ -528,22 +1154,34 @@ def subjects():
     email = request.args.get("email")
     section = request.args.get("section")
 
-    if not all([department, year, semester]):
-        return redirect(url_for("index"))
+    if not department or year not in YEARS or semester not in SEMESTERS:
+        return redirect(INDEX_URL)
 
-    session["department"] = department
-    session["year"] = year
-    session["semester"] = semester
-    session["name"] = name
-    session["email"] = email
-    session["section"] = section
+    changed = update_session(
+        department=department,
+        year=year,
+        semester=semester,
+        name=name,
+        email=email,
+        section=section,
+    )
+    # Admin logout returns here; build the URL once rather than on every logout
+    if changed or "post_logout_url" not in session:
+        session["post_logout_url"] = url_for(
+            "subjects",
+            department=department,
+            year=year,
+            semester=semester,
+            name=name,
+            email=email,
+            section=section,
+        )
 
     try:
-        data = load_data(year, semester)
-        data["stats"]["total_visits"] = data["stats"].get("total_visits", 0) + 1
-        save_data(year, semester, data)
+        data = load_data(year, semester, max_age=DATA_CACHE_TTL)
+        bump_stat(year, semester, "total_visits")
     except Exception as e:
-        print(f"Error loading subjects: {e}")
+        log.exception("Error loading subjects")
         return f"Error loading data: {str(e)}", 500
 
     return render_template(
@@ -559,6 +1197,13 @@ def subjects():
 
 @app.route("/admin/login", methods=["POST"])
 def admin_login():
+    client_ip = request.remote_addr
+    if login_blocked(client_ip):
+        return jsonify({
+            "success": False,
+            "message": "Too many failed attempts. Please try again later.",
+        }), 429
+
     username = request.json.get("username")
     password = request.json.get("password")
 
@@ -576,23 +1221,26 @@ def admin_login():
             session["admin_year"] = year
             return jsonify({"success": True})
 
+    record_login_failure(client_ip)
     return jsonify({"success": False, "message": "Invalid credentials"})
 
 @app.route("/admin")
 def admin_panel():
-    if not session.get("admin_logged_in"):
+    logged_in, admin_year, year, semester = session_values(
+        "admin_logged_in", "admin_year", "year", "semester"
+    )
+    if not logged_in:
         return redirect(url_for("subjects"))
 
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
+    year = admin_year or year
 
     if not all([year, semester]):
-        return redirect(url_for("index"))
+        return redirect(INDEX_URL)
 
     try:
         data = load_data(year, semester)
     except Exception as e:
-        print(f"Error loading admin panel: {e}")
+        log.exception("Error loading admin panel")
         return f"Error loading data: {str(e)}", 500
 
     return render_template(
@@ -604,13 +1252,8 @@ def admin_panel():
     )
 
 @app.route("/admin/add_subject", methods=["POST"])
-def add_subject():
-    if not session.get("admin_logged_in"):
-        return jsonify({"success": False, "message": "Not authorized"})
-
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
-
+@require_admin
+def add_subject(year, semester):
     subject_name = request.json.get("subject_name")
     subject_icon = request.json.get("subject_icon", "fas fa-book")
 
@@ -618,35 +1261,29 @@ def add_subject():
         return jsonify({"success": False, "message": "Subject name is required"})
 
     try:
-        data = load_data(year, semester)
-
-        if any(s["name"].lower() == subject_name.lower() for s in data["subjects"]):
-            return jsonify({"success": False, "message": "Subject already exists"})
+        with editing_data(year, semester) as data:
+            if subject_name.lower() in data["_names"]:
+                return jsonify({"success": False, "message": "Subject already exists"})
 
-        new_subject = {
-            "id": str(uuid.uuid4()),
-            "name": subject_name,
-            "icon": subject_icon,
-            "units": [],
-            "created_at": datetime.now().isoformat(),
-        }
+            new_subject = {
+                "id": str(uuid.uuid4()),
+                "name": subject_name,
+                "icon": subject_icon,
+                "units": [],
+                "created_at": now_iso(),
+            }
 
-        data["subjects"].append(new_subject)
-        save_data(year, semester, data)
+            data["subjects"].append(new_subject)
+            save_data(year, semester, data)
 
         return jsonify({"success": True, "subject": new_subject})
     except Exception as e:
-        print(f"Error adding subject: {e}")
+        log.exception("Error adding subject")
         return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
 @app.route("/admin/edit_subject", methods=["POST"])
-def edit_subject():
-    if not session.get("admin_logged_in"):
-        return jsonify({"success": False, "message": "Not authorized"})
-
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
-
+@require_admin
+def edit_subject(year, semester):
     subject_id = request.json.get("subject_id")
     subject_name = request.json.get("subject_name")
     subject_icon = request.json.get("subject_icon")
@@ -655,28 +1292,22 @@ def edit_subject():
         return jsonify({"success": False, "message": "Missing required fields"})
 
     try:
-        data = load_data(year, semester)
-
-        for subject in data["subjects"]:
-            if subject["id"] == subject_id:
-                subject["name"] = subject_name
-                subject["icon"] = subject_icon
-                save_data(year, semester, data)
-                return jsonify({"success": True, "subject": subject})
-
-        return jsonify({"success": False, "message": "Subject not found"})
+        with editing_data(year, semester) as data:
+            subject = data["_by_id"].get(subject_id)
+            if not subject:
+                return json_body_response(SUBJECT_NOT_FOUND_JSON)
+
+            subject["name"] = subject_name
+            subject["icon"] = subject_icon
+            save_data(year, semester, data)
+        return jsonify({"success": True, "subject": subject})
     except Exception as e:
-        print(f"Error editing subject: {e}")
+        log.exception("Error editing subject")
         return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
 @app.route("/admin/add_unit", methods=["POST"])
-def add_unit():
-    if not session.get("admin_logged_in"):
-        return jsonify({"success": False, "message": "Not authorized"})
-
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
-
+@require_admin
+def add_unit(year, semester):
     subject_id = request.form.get("subject_id")
     unit_number_str = request.form.get("unit_number", "")
     unit_title = request.form.get("unit_title")
@@ -703,49 +1334,39 @@ def add_unit():
             file_stream = uploaded_file.stream
             s3_upload_fileobj(file_stream, S3_BUCKET, key)
         except Exception as e:
-            print(f"Error uploading file: {e}")
+            log.exception("Error uploading file")
             return jsonify(
                 {"success": False, "message": f"File upload failed: {str(e)}"}
             )
 
     try:
-        data = load_data(year, semester)
-
-        subject_found = False
-        for subject in data["subjects"]:
-            if subject["id"] == subject_id:
-                subject_found = True
-                new_unit = {
-                    "id": str(uuid.uuid4()),
-                    "number": unit_number,
-                    "title": unit_title,
-                    "description": unit_description,
-                    "topics": topics,
-                    "pages_count": pages_count,
-                    "filename": filename,
-                    "icon": "fas fa-file-alt",
-                    "created_at": datetime.now().isoformat(),
-                }
-                subject["units"].append(new_unit)
-                break
-
-        if not subject_found:
-            return jsonify({"success": False, "message": "Subject not found"})
-
-        save_data(year, semester, data)
+        with editing_data(year, semester) as data:
+            subject = data["_by_id"].get(subject_id)
+            if not subject:
+                return json_body_response(SUBJECT_NOT_FOUND_JSON)
+
+            new_unit = {
+                "id": str(uuid.uuid4()),
+                "number": unit_number,
+                "title": unit_title,
+                "description": unit_description,
+                "topics": topics,
+                "pages_count": pages_count,
+                "filename": filename,
+                "icon": "fas fa-file-alt",
+                "created_at": now_iso(),
+            }
+            subject["units"].append(new_unit)
+
+            save_data(year, semester, data)
         return jsonify({"success": True})
     except Exception as e:
-        print(f"Error adding unit: {e}")
+        log.exception("Error adding unit")
         return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
 @app.route("/admin/edit_unit", methods=["POST"])
-def edit_unit():
-    if not session.get("admin_logged_in"):
-        return jsonify({"success": False, "message": "Not authorized"})
-
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
-
+@require_admin
+def edit_unit(year, semester):
     subject_id = request.form.get("subject_id")
     unit_id = request.form.get("unit_id")
     unit_number_str = request.form.get("unit_number")
@@ -764,54 +1385,46 @@ def edit_unit():
         return jsonify({"success": False, "message": "Invalid numeric values"})
 
     try:
-        data = load_data(year, semester)
-
-        unit_found = None
-        for subject in data["subjects"]:
-            if subject["id"] == subject_id:
-                for unit in subject["units"]:
-                    if unit["id"] == unit_id:
-                        unit_found = unit
-
-                        unit["number"] = unit_number
-                        unit["title"] = unit_title
-                        unit["description"] = unit_description
-                        unit["topics"] = topics
-                        unit["pages_count"] = pages_count
-
-                        uploaded_file = request.files.get("file")
-                        if uploaded_file and uploaded_file.filename and allowed_file(uploaded_file.filename):
-                            if unit.get("filename"):
-                                old_key = get_s3_key(year, semester, unit["filename"])
-                                s3_delete_file(S3_BUCKET, old_key)
-
-                            filename = secure_filename(uploaded_file.filename)
-                            key = get_s3_key(year, semester, filename)
-                            file_stream = uploaded_file.stream
-                            s3_upload_fileobj(file_stream, S3_BUCKET, key)
-                            unit["filename"] = filename
-
-                        break
-                if unit_found:
-                    break
-
-        if not unit_found:
-            return jsonify({"success": False, "message": "Unit not found"})
-
-        save_data(year, semester, data)
-        return jsonify({"success": True, "unit": unit_found})
+        # The new file goes up before data.json is locked; the one it
+        # replaces is deleted after the save
+        filename = None
+        uploaded_file = request.files.get("file")
+        if uploaded_file and uploaded_file.filename and allowed_file(uploaded_file.filename):
+            filename = secure_filename(uploaded_file.filename)
+            s3_upload_fileobj(uploaded_file.stream, S3_BUCKET, get_s3_key(year, semester, filename))
+
+        old_filename = None
+        with editing_data(year, semester) as data:
+            unit = find_unit(data, subject_id, unit_id)
+            if not unit:
+                # The upload may have replaced a file another unit still uses
+                if filename and not filename_in_use(data, filename):
+                    s3_delete_file(S3_BUCKET, get_s3_key(year, semester, filename))
+                return json_body_response(UNIT_NOT_FOUND_JSON)
+
+            unit["number"] = unit_number
+            unit["title"] = unit_title
+            unit["description"] = unit_description
+            unit["topics"] = topics
+            unit["pages_count"] = pages_count
+
+            if filename:
+                old_filename = unit.get("filename")
+                unit["filename"] = filename
+
+            save_data(year, semester, data)
+
+        # Same name means the upload already replaced it in place
+        if old_filename and old_filename != filename:
+            s3_delete_file(S3_BUCKET, get_s3_key(year, semester, old_filename))
+        return jsonify({"success": True, "unit": unit})
     except Exception as e:
-        print(f"Error editing unit: {e}")
+        log.exception("Error editing unit")
         return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
 @app.route("/admin/delete_unit", methods=["DELETE"])
-def delete_unit():
-    if not session.get("admin_logged_in"):
-        return jsonify({"success": False, "message": "Not authorized"})
-
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
-
+@require_admin
+def delete_unit(year, semester):
     subject_id = request.json.get("subject_id")
     unit_id = request.json.get("unit_id")
 
@@ -819,89 +1432,74 @@ def delete_unit():
         return jsonify({"success": False, "message": "Missing required fields"})
 
     try:
-        data = load_data(year, semester)
+        with editing_data(year, semester) as data:
+            deleted_unit = find_unit(data, subject_id, unit_id)
+            if not deleted_unit:
+                return json_body_response(UNIT_NOT_FOUND_JSON)
 
-        unit_deleted = False
-        for subject in data["subjects"]:
-            if subject["id"] == subject_id:
-                for i, unit in enumerate(subject["units"]):
-                    if unit["id"] == unit_id:
-                        deleted_unit = subject["units"].pop(i)
-                        unit_deleted = True
+            data["_by_id"][subject_id]["units"].remove(deleted_unit)
+            save_data(year, semester, data)
 
-                        if deleted_unit.get("filename"):
-                            key = get_s3_key(year, semester, deleted_unit["filename"])
-                            s3_delete_file(S3_BUCKET, key)
-
-                        break
-                if unit_deleted:
-                    break
-
-        if not unit_deleted:
-            return jsonify({"success": False, "message": "Unit not found"})
-
-        save_data(year, semester, data)
+        if deleted_unit.get("filename"):
+            key = get_s3_key(year, semester, deleted_unit["filename"])
+            s3_delete_file(S3_BUCKET, key)
         return jsonify({"success": True})
     except Exception as e:
-        print(f"Error deleting unit: {e}")
+        log.exception("Error deleting unit")
         return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
 @app.route("/download/<filename>")
 def download_file(filename):
-    year = session.get("year")
-    semester = session.get("semester")
+    year, semester = session_values("year", "semester")
 
     if not all([year, semester]):
         return "Invalid session", 400
 
     try:
         key = get_s3_key(year, semester, filename)
-        file_obj = s3_download_fileobj(S3_BUCKET, key)
+        s3_object = s3_open_object(S3_BUCKET, key)
 
-        if not file_obj:
+        if not s3_object:
             return "File not found", 404
 
-        data = load_data(year, semester)
-        data["stats"]["total_downloads"] = data["stats"].get("total_downloads", 0) + 1
-        save_data(year, semester, data)
+        bump_stat(year, semester, "total_downloads")
 
-        return send_file(file_obj, as_attachment=True, download_name=filename)
+        # Relay the object as it arrives instead of buffering it in memory
+        response = Response(
+            stream_s3_body(s3_object["Body"]),
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            headers={"Content-Length": str(s3_object["ContentLength"])},
+        )
+        response.headers.set("Content-Disposition", "attachment", **attachment_names(filename))
+        return response
     except Exception as e:
-        print(f"Error downloading file: {e}")
+        log.exception("Error downloading file")
         return f"Error downloading file: {str(e)}", 500
 
 @app.route("/admin/delete_subject/<subject_id>", methods=["DELETE"])
-def delete_subject(subject_id):
-    if not session.get("admin_logged_in"):
-        return jsonify({"success": False, "message": "Not authorized"})
-
-    year = session.get("admin_year") or session.get("year")
-    semester = session.get("semester")
-
+@require_admin
+def delete_subject(year, semester, subject_id):
     if not subject_id:
-        return jsonify({"success": False, "message": "Subject ID is required"})
+        return json_body_response(SUBJECT_ID_REQUIRED_JSON)
 
     try:
-        data = load_data(year, semester)
-
-        subject_to_remove = None
-        for i, subject in enumerate(data["subjects"]):
-            if subject["id"] == subject_id:
-                subject_to_remove = data["subjects"].pop(i)
-                break
-
-        if not subject_to_remove:
-            return jsonify({"success": False, "message": "Subject not found"})
-
-        for unit in subject_to_remove.get("units", []):
-            if unit.get("filename"):
-                key = get_s3_key(year, semester, unit["filename"])
-                s3_delete_file(S3_BUCKET, key)
-
-        save_data(year, semester, data)
+        with editing_data(year, semester) as data:
+            subject_to_remove = data["_by_id"].get(subject_id)
+            if not subject_to_remove:
+                return json_body_response(SUBJECT_NOT_FOUND_JSON)
+
+            data["subjects"].remove(subject_to_remove)
+            save_data(year, semester, data)
+
+        keys = [
+            get_s3_key(year, semester, unit["filename"])
+            for unit in subject_to_remove.get("units", [])
+            if unit.get("filename")
+        ]
+        s3_delete_files(S3_BUCKET, keys)
         return jsonify({"success": True})
     except Exception as e:
-        print(f"Error deleting subject: {e}")
+        log.exception("Error deleting subject")
         return jsonify({"success": False, "message": f"Error: {str(e)}"})
 
 # @app.route("/admin/logout")
@@ -933,28 +1531,11 @@ def delete_subject(subject_id):
 
 @app.route("/admin/logout")
 def admin_logout():
-    print("🔓 Admin logout initiated")
-    
     session.pop("admin_logged_in", None)
     session.pop("admin_year", None)
 
-    # Rebuild /subjects URL using existing session values
-    if "department" in session and "year" in session and "semester" in session:
-        print(f"✅ Redirecting to subjects page: dept={session['department']}, year={session['year']}")
-        return redirect(
-            url_for(
-                "subjects",
-                department=session["department"],
-                year=session["year"],
-                semester=session["semester"],
-                name=session.get("name"),
-                email=session.get("email"),
-                section=session.get("section"),
-            )
-        )
-    
-    print("⚠️ Session incomplete, redirecting to index")
-    return redirect(url_for("index"))
+    # Back to the /subjects page stored when the session was set up
+    return redirect(session.pop("post_logout_url", None) or INDEX_URL)
 
 
 # @app.route("/logout")
@@ -967,8 +1548,7 @@ def admin_logout():
 def logout():
     """Logout user and clear session"""
     session.clear()
-    # Add a query parameter to signal clearing localStorage
-    return redirect(url_for("index") + "?clear=true")
+    return redirect(LOGOUT_REDIRECT_URL)
 
 @app.route('/api/contact', methods=['POST'])
 def contact_submit():
@@ -976,67 +1556,65 @@ def contact_submit():
     try:
         data = request.json
         
-        required_fields = ['name', 'email','year','section', 'subject', 'message']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False, 
-                    'message': f'Missing required field: {field}'
-                }), 400
+        error = missing_fields_response(data, CONTACT_FIELDS)
+        if error:
+            return error
         
+        created_at = now_iso()
         contact_data = {
-            'id': str(uuid.uuid4()),
-            'name': data.get('name'),
-            'email': data.get('email'),
-            'year': data.get('year'),
-            'section': data.get('section'),
-            'subject': data.get('subject'),
-            'message': data.get('message'),
-            'timestamp': data.get('timestamp', datetime.now().isoformat()),
+            'id': uuid.uuid4().hex,
+            **{field: data[field] for field in CONTACT_FIELDS},
+            'timestamp': data.get('timestamp') or created_at,
             'status': 'new',
-            'created_at': datetime.now().isoformat()
+            'created_at': created_at
         }
         
         try:
-            contacts_key = 'contacts/submissions.json'
-            try:
-                contacts = s3_download_json(S3_BUCKET, contacts_key)
-                if contacts is None:
-                    contacts = {'submissions': []}
-            except:
-                contacts = {'submissions': []}
-            
-            contacts['submissions'].append(contact_data)
-            
-            s3_upload_json(S3_BUCKET, contacts_key, contacts)
+            # Written as its own object: no read-modify-write of a shared
+            # file, so concurrent submissions can't overwrite each other
+            contact_key = f"{CONTACTS_PREFIX}{contact_data['id']}.json"
+            s3_upload_json(S3_BUCKET, contact_key, contact_data, cache=False)
             
-            print(f"✅ Contact form submission saved: {contact_data['id']}")
+            log.debug("Contact form submission saved: %s", contact_data['id'])
             
             return jsonify({
                 'success': True,
                 'message': 'Your message has been sent successfully!'
             })
             
-        except Exception as e:
-            print(f"❌ Error saving contact submission: {e}")
+        except Exception:
+            log.exception("Error saving contact submission")
             return jsonify({
                 'success': True,
                 'message': 'Your message has been received! We will get back to you soon.'
             })
             
-    except Exception as e:
-        print(f"❌ Contact form error: {e}")
+    except Exception:
+        log.exception("Contact form error")
         return jsonify({
             'success': False,
             'message': 'An error occurred. Please try again or email us directly.'
         }), 500
 
+# Fixed redirect targets, resolved once now that every route is registered
+with app.test_request_context():
+    INDEX_URL = url_for("index")
+    # The query parameter signals the page to clear localStorage
+    LOGOUT_REDIRECT_URL = INDEX_URL + "?clear=true"
+
 if __name__ == "__main__":
-    if not S3_CLIENT:
-        print("=" * 60)
-        print("⚠️  WARNING: S3 CLIENT NOT INITIALIZED")
-        print("⚠️  The application will not function properly!")
-        print("⚠️  Please check your EC2 IAM role and S3 bucket access")
-        print("=" * 60)
-
-    app.run(debug=True, port=5003)
\ No newline at end of file
+    try:
+        get_s3_client()
+    except Exception as e:
+        log.warning(
+            "S3 client not initialized: %s. The application will not function "
+            "properly; check your EC2 IAM role and S3 bucket access", e
+        )
+
+    # Development server only; production runs under gunicorn (gunicorn.conf.py).
+    # Set FLASK_DEBUG=1 for the reloader and interactive debugger.
+    app.run(
+        debug=os.environ.get("FLASK_DEBUG") == "1",
+        port=int(os.environ.get("PORT", "5003")),
+        threaded=True,
+    )
\ No newline at end of file
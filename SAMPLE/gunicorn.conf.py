@@ -0,0 +1,22 @@
+# Production server config, used with: gunicorn app:app
+#
+# Requests spend most of their time waiting on S3, so a single process runs
+# many threads that share one boto3 client (S3_CLIENT_CONFIG in app.py keeps
+# enough pooled connections for them). There is deliberately exactly one
+# worker, and it isn't read from WEB_CONCURRENCY (which some platforms set on
+# their own): the JSON cache, pending stats, data.json locks, login rate
+# limiting and the SQLite uploader all live in the worker process.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5003')}"
+worker_class = "gthread"
+workers = 1
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+
+# Uploads go up to MAX_CONTENT_LENGTH (100MB) and stream through to S3
+timeout = 120
+graceful_timeout = 30
+
+# app.py starts its background threads on import; they wouldn't survive a
+# fork, so load the app in each worker rather than in the master
+preload_app = False